@@ -7,7 +7,6 @@ Connects to greg.app site and fetches plant data for the user, stores to db
 
 from machine import RTC # for getting current time
 import socket
-import ssl
 import re
 import gc
 import json
@@ -16,281 +15,509 @@ import json
 from wifi import Connection
 connection = Connection()
 
-import urequests
 import config  # Ensure config.py defines USERNAME = "your_username_here"
 
+# Matches a full HTML tag; [^>]* keeps the scan linear even on malformed input
+_TAG_RE = re.compile(rb'<[^>]*>')
 
-def process_plant_chunk(chunk):
-    """Decode a chunk (UTF-8) and return it if it contains an <h1> tag."""
-    try:
-        chunk_str = chunk.decode('utf-8')
-    except UnicodeDecodeError:
-        return None
-    return chunk_str if "<h1" in chunk_str else None
+# Bytes carried over between streamed chunks so tokens split across a chunk
+# boundary are still matched (longest token is <div class="plant-detail">)
+_TAIL_LEN = 64
 
+# Opener of the misc-detail divs the article scan looks for. A combined
+# alternation regex would need search(string, pos) to resume mid-buffer,
+# which MicroPython's re does not support, so the scan dispatches on the
+# tag name after each '<' instead.
+_DETAIL_DIV = b'<div class="plant-detail">'
 
-def process_plant_page(url):
-    """
-    Fetch a plant page in streaming mode and return the first chunk that 
-    contains an <h1> tag.
-    """
-    response = urequests.get(url, stream=True)
-    while True:
-        chunk = response.raw.read(4096) # 4096 bytes should be enough to grab all useful info
-        if not chunk:
-            break
-        data = process_plant_chunk(chunk)
-        if data is not None:
-            response.close()
-            return data
-    response.close()
-    return None
+# The username never changes at runtime, so the link search key and the
+# plant URL prefix are built once at import time
+_USER_PLANTS = (config.USERNAME + "/plants/").encode()
+_USER_PLANTS_LEN = len(_USER_PLANTS)
+_PLANT_URL_PREFIX = "http://greg.app/" + config.USERNAME.lower() + "/plants/"
+
+# One RTC instance for the life of the process; no need to re-create it
+# on every timestamp
+_RTC = RTC()
+
+# Reusable socket read buffer; readinto fills it in place so no bytes
+# object is allocated per read
+_CHUNK = bytearray(1024)
 
 
-def fetch_url(url):
-    """Fetch the URL and return its HTML content."""
-    response = urequests.get(url)
-    html = response.text
-    response.close()
-    return html
+def _split_url(url):
+    """Split an http:// URL into (host, path)."""
+    _, _, rest = url.partition('://')
+    host, _, path = rest.partition('/')
+    return host, '/' + path
 
 
-def find_plant_links(html, username):
+class GregSession:
     """
-    Extract plant links from HTML by locating occurrences of the user's
-    plant path and extracting the following 8-character plant ID.
+    Persistent HTTP/1.1 connection to one host. Every page we fetch lives
+    on greg.app, so a single keep-alive socket amortizes the DNS lookup
+    and TCP handshake across all GETs instead of paying them per page —
+    over slow Wi-Fi the handshake dominates each request.
     """
-    links = []
+
+    def __init__(self, host, port=80):
+        self.host = host
+        self.port = port
+        self._sock = None
+
+    def _connect(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self._sock = socket.socket()
+        # A stalled peer must raise instead of blocking the main loop forever
+        self._sock.settimeout(10)
+        self._sock.connect(addr)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def get(self, path, sink):
+        """
+        GET path and stream the response body to sink(chunk), skipping
+        urequests' Response wrapper and its .text allocation. Each chunk is
+        a view into the shared read buffer, so sinks must copy anything
+        they keep; sink may return True to stop reading early. Reuses the
+        open socket and reconnects once if the server closed it between
+        requests.
+        """
+        request = (b'GET %s HTTP/1.1\r\nHost: %s\r\n'
+                   b'Connection: keep-alive\r\n\r\n'
+                   % (path.encode(), self.host.encode()))
+
+        if self._sock is None:
+            self._connect()
+        try:
+            self._sock.send(request)
+            n = self._sock.readinto(_CHUNK)
+        except OSError:
+            n = 0
+        if not n:
+            # Server dropped the idle connection; reconnect and retry once
+            self.close()
+            self._connect()
+            self._sock.send(request)
+            n = self._sock.readinto(_CHUNK)
+
+        # Read until the end of the headers; the blank line may straddle reads
+        header = _CHUNK[:n]
+        while True:
+            sep = header.find(b'\r\n\r\n')
+            if sep != -1:
+                break
+            n = self._sock.readinto(_CHUNK)
+            if not n:
+                raise OSError("connection closed during headers")
+            header.extend(_CHUNK[:n])
+
+        # Content-Length tells us where this response ends so the next GET
+        # can go out on the same socket
+        length = -1
+        cl = header[:sep].lower().find(b'content-length:')
+        if cl != -1:
+            eol = header.find(b'\r\n', cl)
+            length = int(header[cl + len(b'content-length:'):eol])
+
+        if length < 0:
+            # No Content-Length (e.g. a chunked keep-alive response): we
+            # cannot tell where the body ends, so reading to EOF would hang
+            # on the open connection and chunk framing would pollute the
+            # body. Retry over HTTP/1.0, which forbids chunked coding and
+            # is delimited by the server closing the socket.
+            self.close()
+            self._get_close_delimited(path, sink)
+            return
+
+        body = memoryview(header)[sep + 4:]
+        remaining = length - len(body)
+        stopped = sink(body) if len(body) else False
+        while not stopped and remaining > 0:
+            n = self._sock.readinto(_CHUNK)
+            if not n:
+                break
+            remaining -= n
+            stopped = sink(memoryview(_CHUNK)[:n])
+
+        if stopped or remaining > 0:
+            # Mid-response; the socket can't be reused safely
+            self.close()
+
+    def _get_close_delimited(self, path, sink):
+        """
+        One-shot HTTP/1.0 GET on a fresh connection, streaming the body to
+        sink until the server closes the socket.
+        """
+        self._connect()
+        self._sock.send(b'GET %s HTTP/1.0\r\nHost: %s\r\nConnection: close\r\n\r\n'
+                        % (path.encode(), self.host.encode()))
+
+        header = bytearray()
+        while True:
+            sep = header.find(b'\r\n\r\n')
+            if sep != -1:
+                break
+            n = self._sock.readinto(_CHUNK)
+            if not n:
+                raise OSError("connection closed during headers")
+            header.extend(_CHUNK[:n])
+
+        body = memoryview(header)[sep + 4:]
+        stopped = sink(body) if len(body) else False
+        while not stopped:
+            n = self._sock.readinto(_CHUNK)
+            if not n:
+                break
+            stopped = sink(memoryview(_CHUNK)[:n])
+        self.close()
+
+
+def fetch_url(url, session=None):
+    """Fetch the URL and return its raw HTML content as bytes."""
+    parts = []
+
+    def sink(chunk):
+        # Chunks are views into the session's shared read buffer
+        parts.append(bytes(chunk))
+
+    host, path = _split_url(url)
+    own_session = session is None
+    if own_session:
+        session = GregSession(host)
+    session.get(path, sink)
+    if own_session:
+        session.close()
+    return b''.join(parts)
+
+
+def _valid_plant_id(raw):
+    """True if raw is exactly 8 lowercase alphanumeric bytes."""
+    if len(raw) != 8:
+        return False
+    for c in raw:
+        if not (48 <= c <= 57 or 97 <= c <= 122):  # '0'-'9', 'a'-'z'
+            return False
+    return True
+
+
+def find_plant_links(html):
+    """
+    Extract plant links from HTML (bytes) by locating occurrences of the
+    user's plant path and validating the following 8-character plant ID.
+    Duplicate occurrences (thumbnail + card) yield one link.
+    """
+    seen = set()
     plant_ids = []
     start = 0
-    search_str = f"{username}/plants/"
     while True:
-        pos = html.find(search_str, start)
+        pos = html.find(_USER_PLANTS, start)
         if pos == -1:
             break
-        pos += len(search_str)
-        plant_id = html[pos:pos + 8]
-        plant_ids.append(plant_id)
-        start = pos + 8
+        pos += _USER_PLANTS_LEN
+        raw_id = html[pos:pos + 8]
+        start = pos
+        # Validate before fetching: a truncated or malformed occurrence
+        # must not yield a garbage ID and a wasted round trip
+        if not _valid_plant_id(raw_id) or html[pos + 8:pos + 9] != b'/':
+            continue
+        plant_id = raw_id.decode()
+        if plant_id not in seen:
+            seen.add(plant_id)
+            plant_ids.append(plant_id)
 
     print("Found plant IDs:", plant_ids)
-    for plant_id in plant_ids:
-        link = f"http://greg.app/{username.lower()}/plants/{plant_id}/"
-        links.append(link)
-    return links
+    return [_PLANT_URL_PREFIX + plant_id + "/" for plant_id in plant_ids]
 
 
 def strip_tags(text):
-    """Remove HTML tags from text."""
-    result = []
-    in_tag = False
-    for ch in text:
-        if ch == '<':
-            in_tag = True
-            continue
-        if ch == '>':
-            in_tag = False
-            continue
-        if not in_tag:
-            result.append(ch)
-    return ''.join(result).strip()
+    """Remove HTML tags from text (bytes)."""
+    return _TAG_RE.sub(b'', text).strip()
 
 
-def extract_plant_data(html):
+def _extract_plant_detail(html, div_start, div_end, return_data):
     """
-    Extract the plant name and species from HTML. The function locates
-    the <article> element with id="plant-profile" and then extracts the first 
-    <h1> tag as the name and the first <h3> tag as the species.
+    Parse one <div class="plant-detail"> region (html[div_start:div_end])
+    and store its img identifier / span value pair in return_data. html is
+    raw bytes; only the extracted identifier and value are decoded.
+    """
+    img_tag_start = html.find(b'<img', div_start, div_end)
+    if img_tag_start == -1:
+        return
+    img_tag_end = html.find(b'>', img_tag_start, div_end)
+    if img_tag_end == -1:
+        return
+
+    identifier = None
+
+    # Try to find src attribute
+    src_start = html.find(b'src="', img_tag_start, img_tag_end)
+    if src_start != -1:
+        src_start += len(b'src="')
+        src_end = html.find(b'"', src_start, img_tag_end)
+        if src_end != -1:
+            img_path = html[src_start:src_end]
+            identifier = img_path.split(b'/')[-1].split(b'.')[0]
+
+    # If no src found or if identifier is empty, try alt attribute
+    if not identifier:
+        alt_start = html.find(b'alt="', img_tag_start, img_tag_end)
+        if alt_start != -1:
+            alt_start += len(b'alt="')
+            alt_end = html.find(b'"', alt_start, img_tag_end)
+            if alt_end != -1:
+                identifier = html[alt_start:alt_end].replace(b'-', b'_')
+    if not identifier:
+        return
+
+    # Find the span content
+    span_start = html.find(b'<span>', img_tag_end, div_end)
+    if span_start != -1:
+        span_start += len(b'<span>')
+        span_end = html.find(b'</span>', span_start, div_end)
+        if span_end != -1:
+            value = html[span_start:span_end].strip()
+            return_data[identifier.decode('utf-8')] = value.decode('utf-8')
+
+
+class PlantDataParser:
+    """
+    Incremental parser for a plant page. Feed it raw byte chunks as they
+    arrive from the socket; it locates the <article> element with
+    id="plant-profile" and extracts the first <h1> tag as the name, the
+    first <h3> tag as the species and every plant-detail div as a misc
+    field, accumulating results in self.data.
+
+    Only a small tail is carried between feed() calls to handle tokens
+    split across chunk boundaries, so a 50 KB page can be parsed with a
+    few KB of RAM.
     """
 
-    return_data = {}
-
-    # Locate the <article> tag with id="plant-profile"
-    index = 0
-    while True:
-        start_index = html.find("<article", index)
-        if start_index == -1:
-            return None, None  # Article tag not found
-        end_of_tag = html.find(">", start_index)
-        if end_of_tag == -1:
-            return None, None  # Malformed HTML
-        opening_tag = html[start_index:end_of_tag + 1]
-        if 'id="plant-profile"' in opening_tag:
-            break
-        index = end_of_tag + 1
-
-    article_content = html[end_of_tag + 1:]
-
-    # Extract plant name from the first <h1> tag
-    open_h1 = article_content.find("<h1")
-    if open_h1 != -1:
-        tag_close = article_content.find(">", open_h1)
-        if tag_close != -1:
-            close_h1 = article_content.find("</h1>", tag_close)
-            if close_h1 != -1:
-                plant_name = article_content[tag_close + 1:close_h1].strip()
-                return_data["plant_name"] = plant_name
-                search_index = close_h1 + len("</h1>")
+    def __init__(self):
+        self.data = {}
+        self.done = False
+        # One reusable buffer: extend in place with each chunk and trim the
+        # consumed prefix in place, instead of concatenating and re-slicing
+        # fresh bytes objects per feed
+        self._buf = bytearray()
+        self._in_article = False
+        self._have_name = False
+        self._have_type = False
+        self._eof = False
+
+    def feed(self, chunk):
+        """Consume the next chunk of the page, updating self.data."""
+        if self.done:
+            return
+        self._buf.extend(chunk)
+        keep = self._scan(self._buf)
+        del self._buf[:keep]
+
+    def finish(self):
+        """
+        Flush the buffered tail once the stream has ended. Tokens that
+        begin inside the final tail window are parsed now instead of
+        waiting for data that will never arrive.
+        """
+        if self.done or not self._buf:
+            return
+        self._eof = True
+        self._scan(self._buf)
+        del self._buf[:]
+
+    def _scan(self, html):
+        """
+        Run the single-pass scan over html and return the index from which
+        data must be retained for the next feed() call (an unfinished token,
+        or a short tail in case a tag is split across the boundary).
+        """
+        i = 0
+
+        # Locate the <article> tag with id="plant-profile". The page has
+        # exactly one, with id as the first attribute, so one scan for the
+        # full literal normally finds it; fall back to probing every
+        # <article tag for pages that order attributes differently.
+        if not self._in_article:
+            # Fast path: most chunks before the profile hold no article tag
+            # at all, so one cheap scan rejects them before any tag parsing.
+            # Keep a tail in case '<article' straddles the boundary.
+            first = html.find(b'<article')
+            if first == -1:
+                return max(0, len(html) - _TAIL_LEN)
+            start_index = html.find(b'<article id="plant-profile"', first)
+            if start_index == -1:
+                index = first
+                while True:
+                    start_index = html.find(b'<article', index)
+                    if start_index == -1:
+                        return max(0, len(html) - _TAIL_LEN)
+                    end_of_tag = html.find(b'>', start_index)
+                    if end_of_tag == -1:
+                        return start_index  # Opening tag not complete yet
+                    if b'id="plant-profile"' in html[start_index:end_of_tag + 1]:
+                        break
+                    index = end_of_tag + 1
             else:
-                search_index = tag_close + 1
-        else:
-            search_index = 0
-    else:
-        search_index = 0
-
-    # Extract plant species from the first <h3> tag after the plant name
-    open_h3 = article_content.find("<h3", search_index)
-    if open_h3 != -1:
-        tag_close = article_content.find(">", open_h3)
-        if tag_close != -1:
-            close_h3 = article_content.find("</h3>", tag_close)
-            if close_h3 != -1:
-                h3_raw = article_content[tag_close + 1:close_h3].strip()
-                plant_type = strip_tags(h3_raw)
-                return_data["plant_type"] = plant_type
-                search_index = close_h3 + len("</h3>")
-
-    # Next extract all misc plant details, keep looping until all found
-    while True:
-        # Find the next plant-detail div
-        div_start = html.find('<div class="plant-detail">', search_index)
-        if div_start == -1:
-            break
-            
-        # Find the closing div
-        div_end = html.find('</div>', div_start)
-        if div_end == -1:
-            break
-            
-        # Extract the div content
-        div_content = html[div_start:div_end]
-        
-        # Find the image tag
-        img_tag_start = div_content.find('<img')
-        if img_tag_start != -1:
-            img_tag_end = div_content.find('>', img_tag_start)
-            if img_tag_end != -1:
-                img_tag = div_content[img_tag_start:img_tag_end + 1]
-                
-                # Try to find src attribute
-                src_start = img_tag.find('src="')
-                if src_start != -1:
-                    src_start += len('src="')
-                    src_end = img_tag.find('"', src_start)
-                    if src_end != -1:
-                        img_path = img_tag[src_start:src_end]
-                        identifier = img_path.split('/')[-1].split('.')[0]
-                
-                # If no src found or if identifier is empty, try alt attribute
-                if 'identifier' not in locals() or not identifier:
-                    alt_start = img_tag.find('alt="')
-                    if alt_start != -1:
-                        alt_start += len('alt="')
-                        alt_end = img_tag.find('"', alt_start)
-                        if alt_end != -1:
-                            identifier = img_tag[alt_start:alt_end].replace('-', '_')
-                
-                # Find the span content
-                span_start = div_content.find('<span>')
-                if span_start != -1:
-                    span_start += len('<span>')
-                    span_end = div_content.find('</span>', span_start)
-                    if span_end != -1:
-                        value = div_content[span_start:span_end].strip()
-                        return_data[identifier] = value
-        
-        # Move search position to after this div
-        search_index = div_end + 1
-
-    return return_data
-
-
-def write_plant_data_to_json(plant_data, plant_id, filename="plant_data.json"):
+                end_of_tag = html.find(b'>', start_index)
+                if end_of_tag == -1:
+                    return start_index  # Opening tag not complete yet
+            self._in_article = True
+            i = end_of_tag + 1
+
+        # Single pass over the article body: advance one cursor, dispatching
+        # on the tag name at each '<'.
+        while True:
+            i = html.find(b'<', i)
+            if i == -1:
+                return len(html)
+            if not self._eof and len(html) - i < _TAIL_LEN:
+                return i  # Tag may continue in the next chunk
+            token = html[i + 1:i + 5]
+            if not self._have_name and token.startswith(b'h1'):
+                tag_close = html.find(b'>', i)
+                if tag_close == -1:
+                    return i
+                close_h1 = html.find(b'</h1>', tag_close)
+                if close_h1 == -1:
+                    return i
+                self.data["plant_name"] = html[tag_close + 1:close_h1].strip().decode('utf-8')
+                self._have_name = True
+                i = close_h1 + len(b'</h1>')
+            elif self._have_name and not self._have_type and token.startswith(b'h3'):
+                tag_close = html.find(b'>', i)
+                if tag_close == -1:
+                    return i
+                close_h3 = html.find(b'</h3>', tag_close)
+                if close_h3 == -1:
+                    return i
+                self.data["plant_type"] = strip_tags(html[tag_close + 1:close_h3]).decode('utf-8')
+                self._have_type = True
+                i = close_h3 + len(b'</h3>')
+            elif token.startswith(b'div ') and html[i:i + len(_DETAIL_DIV)] == _DETAIL_DIV:
+                div_end = html.find(b'</div>', i)
+                if div_end == -1:
+                    return i
+                _extract_plant_detail(html, i, div_end, self.data)
+                i = div_end + len(b'</div>')
+            elif token.startswith(b'/art'):
+                # End of the plant profile; nothing left to extract
+                self.done = True
+                return len(html)
+            else:
+                i += 1
+
+
+def parse_plant_stream(url, session=None):
     """
-    Takes a dictionary of plant data and appends it to a JSON file with a timestamp.
-    Modified for MicroPython compatibility.
-    
+    Fetch a plant page in streaming mode, feeding each chunk straight into
+    a PlantDataParser so the full body is never buffered in RAM. Returns
+    the dict of extracted plant data.
+    """
+    parser = PlantDataParser()
+
+    def sink(chunk):
+        parser.feed(chunk)
+        return parser.done
+
+    host, path = _split_url(url)
+    own_session = session is None
+    if own_session:
+        session = GregSession(host)
+    session.get(path, sink)
+    parser.finish()
+    if own_session:
+        session.close()
+    return parser.data
+
+
+def _timestamp():
+    """Current RTC time as 'YYYY-MM-DD HH:MM:SS'."""
+    t = _RTC.datetime()
+    return f"{t[0]:04d}-{t[1]:02d}-{t[2]:02d} {t[4]:02d}:{t[5]:02d}:{t[6]:02d}"
+
+
+def write_plant_batch(entries, filename="plant_data.jsonl"):
+    """
+    Append a batch of entries to the JSON Lines file (one JSON object per
+    line), opening the file once for the whole batch. Appending is O(1)
+    per entry regardless of how much history the file holds, unlike
+    rewriting a single JSON array.
+
     Args:
-        plant_data (dict): Dictionary containing plant information
-        filename (str): Name of the output JSON file (default: "plant_data.json")
-        
+        entries (list): Entry dicts to append
+        filename (str): Name of the output file (default: "plant_data.jsonl")
+
     Returns:
         None
     """
-    # Get current time from RTC
-    rtc = RTC()
-    current_time = rtc.datetime()
-    timestamp = "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(
-        current_time[0],  # year
-        current_time[1],  # month
-        current_time[2],  # day
-        current_time[4],  # hours
-        current_time[5],  # minutes
-        current_time[6]   # seconds
-    )
-    
-    # Create the new entry
-    new_entry = {
-        "plant_id": plant_id,
-        "timestamp": timestamp,
-        "data": plant_data
-    }
-    
+    if not entries:
+        return
     try:
-        # Try to read existing data
-        try:
-            with open(filename, 'r') as f:
-                content = f.read()
-                if content:
-                    existing_data = json.loads(content)
-                    if not isinstance(existing_data, list):
-                        existing_data = [existing_data]
-                else:
-                    existing_data = []
-        except (OSError, ValueError):
-            existing_data = []
-        
-        # Append new entry
-        existing_data.append(new_entry)
-        
-        # Write back to file
-        with open(filename, 'w') as f:
-            f.write(json.dumps(existing_data))
-            
+        with open(filename, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry))
+                f.write('\n')
     except OSError as e:
         print("Error writing to file:", str(e))
 
+
+def write_plant_data_to_json(plant_data, plant_id, filename="plant_data.jsonl"):
+    """
+    Takes a dictionary of plant data and appends it to the JSON Lines file
+    with a timestamp. Convenience wrapper around write_plant_batch for a
+    single plant.
+    """
+    write_plant_batch([{
+        "plant_id": plant_id,
+        "timestamp": _timestamp(),
+        "data": plant_data
+    }], filename)
+
+
 def main():
-    username = config.USERNAME
-    username_lower = username.lower()
+    username_lower = config.USERNAME.lower()
     base_url = f"http://greg.app/{username_lower}/"
     print("Fetching main page:", base_url)
-    
-    main_html = fetch_url(base_url)
-    plant_links = find_plant_links(main_html, username)
-    
+
+    # One keep-alive connection serves the main page and every plant page
+    session = GregSession("greg.app")
+
+    main_html = fetch_url(base_url, session)
+    plant_links = find_plant_links(main_html)
+
     del main_html  # Free memory
     gc.collect()
 
+    batch = []
     for link in plant_links:
         plant_id = link.split("/")[-2] # Grab the plant id from the full url
 
         print("\nFetching plant page:", link)
         print("Free memory:", gc.mem_free())
-        plant_html = process_plant_page(link)
-        plant_info = extract_plant_data(plant_html)
+        plant_info = parse_plant_stream(link, session)
         if plant_info is not None and plant_info != {}:
             print("Plant info:")
             for key, value in plant_info.items():
                 print(f"- {key}: {value}")
         else:
             print("Error: Could not extract plant details from", link)
-            
-        write_plant_data_to_json(plant_info, plant_id)
 
-        del plant_html
+        batch.append({
+            "plant_id": plant_id,
+            "timestamp": _timestamp(),
+            "data": plant_info
+        })
+
         gc.collect()
 
+    session.close()
+
+    # One file open and flush for the whole run instead of one per plant
+    write_plant_batch(batch)
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,4 @@
 import urequests
-import json
 
 import config
 
@@ -7,18 +6,18 @@ import config
 api_key = config.API_KEY
 url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key=" + api_key
 
+# The payload never changes, so keep the serialized bytes as a constant
+# instead of building a dict and json.dumps-ing it on every run
+BODY = b'{"contents":[{"parts":[{"text":"Explain how AI works"}]}]}'
+
+# No explicit Content-Length: urequests adds its own whenever data is
+# set, and a duplicate header gets the request rejected
 headers = {
     "Content-Type": "application/json"
 }
 
-data = {
-    "contents": [{
-        "parts": [{"text": "Explain how AI works"}]
-    }]
-}
-
 # Send the POST request
-response = urequests.post(url, headers=headers, data=json.dumps(data))
+response = urequests.post(url, headers=headers, data=BODY)
 
 # Print the response from the API
 print(response.text)
@@ -11,19 +11,26 @@ import time
 import config
 
 class Connection():
-    def __init__(self):
+    def __init__(self, timeout_ms=15000):
         # Connect to Wi-Fi
         self.wifi = network.WLAN(network.STA_IF)
         self.wifi.active(True)
         self.wifi.connect(config.WIFI_SSID, config.WIFI_PWD)
 
-        # Wait for connection
+        # Poll quickly at first so we notice the link the moment it comes
+        # up, backing off while association is still in progress, and give
+        # up at the deadline instead of spinning forever
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        delay = 50
         while not self.wifi.isconnected():
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                raise OSError("wifi timeout")
             print("Not connected...")
-            time.sleep(1)
+            time.sleep_ms(delay)
+            delay = min(delay * 2, 500)
 
         # Print success message
-        print('Connected to Wi-Fi, IP address:', self.wifi.ifconfig()[0])    
+        print('Connected to Wi-Fi, IP address:', self.wifi.ifconfig()[0])
 
 
 if __name__ == "__main__":